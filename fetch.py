@@ -1,19 +1,28 @@
 import asyncio
+import base64
+import bisect
 import ipaddress
 import os
 import random
+import re
 import socket
 import subprocess
 import sys
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from urllib.parse import urlparse
 
-import aiohttp
+from typing import TYPE_CHECKING
+
 from playwright.async_api import (
     async_playwright, Browser, BrowserContext, Page, Response,
     Error as PlaywrightError,
 )
-from playwright_stealth import Stealth
+
+if TYPE_CHECKING:
+    import aiohttp
+    from playwright_stealth import Stealth
 
 MAX_WAIT = 30.0
 MAX_SCREENSHOT_BYTES = 20 * 1024 * 1024  # 20 MB
@@ -28,7 +37,7 @@ class FetchError(Exception):
 @dataclass
 class FetchResult:
     """Result of fetching a page."""
-    html: str
+    html: bytes  # UTF-8 encoded
     url: str  # final URL after redirects
     status: int
     title: str
@@ -54,11 +63,55 @@ PRIVATE_NETWORKS = [
     ipaddress.ip_network("fe80::/10"),
 ]
 
-_stealth = Stealth()
+# The same networks as sorted (low, high) integer ranges per family, so a
+# resolved address costs one bisect plus one comparison instead of a
+# containment check against every network object.
+_V4_RANGES = sorted(
+    (int(n.network_address), int(n.broadcast_address))
+    for n in PRIVATE_NETWORKS if n.version == 4
+)
+_V6_RANGES = sorted(
+    (int(n.network_address), int(n.broadcast_address))
+    for n in PRIVATE_NETWORKS if n.version == 6
+)
+_V4_LOWS = [lo for lo, _ in _V4_RANGES]
+_V6_LOWS = [lo for lo, _ in _V6_RANGES]
+
+
+def _is_private_address(addr: ipaddress.IPv4Address | ipaddress.IPv6Address) -> bool:
+    # Handle IPv6-mapped IPv4 addresses (e.g. ::ffff:127.0.0.1)
+    if isinstance(addr, ipaddress.IPv6Address) and addr.ipv4_mapped:
+        addr = addr.ipv4_mapped
+    lows, ranges = (_V4_LOWS, _V4_RANGES) if addr.version == 4 else (_V6_LOWS, _V6_RANGES)
+    x = int(addr)
+    i = bisect.bisect_right(lows, x) - 1
+    return i >= 0 and x <= ranges[i][1]
+
+# Chromium accumulates memory per navigation even when contexts are closed;
+# recycling the browser every N pages keeps a long-lived server's RSS bounded.
+BROWSER_MAX_PAGES = 200
+
+# Fixed number of worker tasks draining the page-job queue. A queue plus
+# fixed workers bounds memory under burst traffic: waiters are plain queue
+# entries instead of one parked Task per request.
+MAX_WORKERS = 4
+
+# aiohttp and playwright_stealth are imported lazily (both cost tens of ms
+# and build TLS/JS state at import time), so bare server start stays cheap.
+_stealth: "Stealth | None" = None
 _playwright = None
 _browser: Browser | None = None
 _browser_lock: asyncio.Lock | None = None
-_semaphore: asyncio.Semaphore | None = None
+_install_lock: asyncio.Lock | None = None
+_browser_page_count = 0
+# Open pages per browser instance; a retired browser (no longer _browser)
+# is closed only once its count drains to zero.
+_open_pages: dict[Browser, int] = {}
+_http_session: "aiohttp.ClientSession | None" = None
+_http_session_loop: asyncio.AbstractEventLoop | None = None
+_work_queue: asyncio.Queue | None = None
+_workers: list[asyncio.Task] = []
+_queue_loop: asyncio.AbstractEventLoop | None = None
 
 
 def _get_lock() -> asyncio.Lock:
@@ -68,49 +121,186 @@ def _get_lock() -> asyncio.Lock:
     return _browser_lock
 
 
-def _get_semaphore() -> asyncio.Semaphore:
-    global _semaphore
-    if _semaphore is None:
-        _semaphore = asyncio.Semaphore(4)
-    return _semaphore
+def _get_install_lock() -> asyncio.Lock:
+    global _install_lock
+    if _install_lock is None:
+        _install_lock = asyncio.Lock()
+    return _install_lock
+
+
+def _get_queue() -> asyncio.Queue:
+    """Return the page-job queue, spawning its workers on first use."""
+    global _work_queue, _workers, _queue_loop
+    loop = asyncio.get_running_loop()
+    if _work_queue is None or _queue_loop is not loop:
+        _work_queue = asyncio.Queue()
+        _queue_loop = loop
+        _workers = [loop.create_task(_worker(_work_queue)) for _ in range(MAX_WORKERS)]
+    return _work_queue
+
+
+async def _worker(queue: asyncio.Queue) -> None:
+    # Bound to the queue it was spawned for: the global can be swapped (loop
+    # change in _get_queue) or cleared (shutdown) while this task still runs.
+    while True:
+        future, job = await queue.get()
+        try:
+            result = await job()
+        except asyncio.CancelledError:
+            # Worker cancelled mid-job (shutdown); release the caller too
+            if not future.done():
+                future.cancel()
+            raise
+        except Exception as e:
+            if not future.cancelled():
+                future.set_exception(e)
+        else:
+            if not future.cancelled():
+                future.set_result(result)
+        finally:
+            queue.task_done()
+
+
+async def _run_queued(job):
+    """Queue a page job for the worker pool and await its result."""
+    queue = _get_queue()
+    future = asyncio.get_running_loop().create_future()
+    await queue.put((future, job))
+    return await future
 
 
 # ---------------------------------------------------------------------------
 # URL validation (SSRF protection)
 # ---------------------------------------------------------------------------
 
-def validate_url(url: str) -> None:
+DNS_CACHE_ENTRIES = 256
+DNS_CACHE_TTL = 300.0  # 5 minutes
+DNS_FAILURE_TTL = 60.0  # cache NXDOMAIN briefly; typos get retried sooner
+
+
+class _AsyncDNSCache:
+    """LRU+TTL cache around the event loop's non-blocking getaddrinfo.
+
+    socket.getaddrinfo blocks the calling thread for tens to hundreds of ms
+    on a cold hostname; resolving through the loop keeps the event loop free,
+    and caching makes repeat lookups of the same host an O(1) dict hit.
+    Resolution failures are cached too (with a shorter TTL) so repeatedly
+    requested bad hostnames don't pay a full DNS round-trip every time.
+    """
+
+    def __init__(self, maxsize: int = DNS_CACHE_ENTRIES, ttl: float = DNS_CACHE_TTL,
+                 failure_ttl: float = DNS_FAILURE_TTL):
+        # hostname -> (timestamp, addresses); None addresses mark a failure
+        self._entries: OrderedDict[str, tuple[float, list[str] | None]] = OrderedDict()
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._failure_ttl = failure_ttl
+
+    async def resolve(self, hostname: str) -> list[str]:
+        """Return the addresses hostname resolves to, caching for the TTL."""
+        now = time.monotonic()
+        entry = self._entries.get(hostname)
+        if entry is not None:
+            ts, addrs = entry
+            ttl = self._ttl if addrs is not None else self._failure_ttl
+            if now - ts < ttl:
+                self._entries.move_to_end(hostname)
+                if addrs is None:
+                    raise socket.gaierror(
+                        socket.EAI_NONAME, f"cached resolution failure for {hostname}")
+                return addrs
+            del self._entries[hostname]
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(hostname, None, proto=socket.IPPROTO_TCP)
+        except socket.gaierror:
+            self._store(hostname, now, None)
+            raise
+        addrs = [info[4][0] for info in infos]
+        self._store(hostname, now, addrs)
+        return addrs
+
+    def _store(self, hostname: str, ts: float, addrs: list[str] | None) -> None:
+        self._entries[hostname] = (ts, addrs)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_dns_cache = _AsyncDNSCache()
+
+# Fast path for the common well-formed case: scheme://host[:port] with no
+# userinfo, IPv6 literal, percent-escapes, or other oddities. Anything that
+# doesn't match falls back to urlparse so validation semantics are identical.
+_SIMPLE_URL_RE = re.compile(r"^(https?)://([A-Za-z0-9._\-]+)(?::\d+)?(?=[/?#]|$)",
+                            re.IGNORECASE)
+
+
+async def validate_url(url: str) -> None:
     """Reject URLs targeting internal networks or non-HTTP schemes."""
+    m = _SIMPLE_URL_RE.match(url)
+    if m:
+        await _check_hostname(m.group(2).lower())
+        return
     parsed = urlparse(url)
     if parsed.scheme.lower() not in ("http", "https"):
         raise FetchError(f"Only http and https URLs are supported, got: {parsed.scheme!r}")
     if not parsed.hostname:
         raise FetchError(f"Invalid URL (no hostname): {url}")
-    _check_hostname(parsed.hostname)
+    await _check_hostname(parsed.hostname)
+
 
+def reject_url(url: str) -> str | None:
+    """Cheap synchronous screen for URLs that can never pass validation.
 
-def _check_hostname(hostname: str) -> None:
+    Returns the rejection message for URLs that are wrong on their face —
+    bad scheme, missing hostname, or a literal private IP — without DNS,
+    await points, or exception unwinding, so hot callers can fail fast.
+    Returns None for anything plausible; full validation (including
+    resolution) still happens in validate_url.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme.lower() not in ("http", "https"):
+        return f"Only http and https URLs are supported, got: {parsed.scheme!r}"
+    if not parsed.hostname:
+        return f"Invalid URL (no hostname): {url}"
+    try:
+        addr = ipaddress.ip_address(parsed.hostname)
+    except ValueError:
+        return None  # not an IP literal; needs DNS to judge
+    if _is_private_address(addr):
+        return f"Access to private/internal addresses is blocked: {parsed.hostname} resolves to {addr}"
+    return None
+
+
+async def _check_hostname(hostname: str) -> None:
     """Resolve hostname and verify it doesn't point to a private/reserved IP."""
     try:
-        infos = socket.getaddrinfo(hostname, None, proto=socket.IPPROTO_TCP)
+        addrs = await _dns_cache.resolve(hostname)
     except socket.gaierror:
         raise FetchError(f"Could not resolve hostname: {hostname}")
-    for info in infos:
-        addr = ipaddress.ip_address(info[4][0])
-        # Handle IPv6-mapped IPv4 addresses (e.g. ::ffff:127.0.0.1)
-        if isinstance(addr, ipaddress.IPv6Address) and addr.ipv4_mapped:
-            addr = addr.ipv4_mapped
-        for network in PRIVATE_NETWORKS:
-            if addr in network:
-                raise FetchError(f"Access to private/internal addresses is blocked: {hostname} resolves to {addr}")
+    for raw in addrs:
+        addr = ipaddress.ip_address(raw)
+        if _is_private_address(addr):
+            raise FetchError(f"Access to private/internal addresses is blocked: {hostname} resolves to {addr}")
 
 
 # ---------------------------------------------------------------------------
 # Browser management
 # ---------------------------------------------------------------------------
 
+# Sentinel file written once the install check has passed so later process
+# starts skip the subprocess probe entirely.
+_CHROMIUM_SENTINEL = os.path.expanduser("~/.cache/browserfetch/chromium_ok")
+_chromium_checked = False
+
+
 def _ensure_chromium_installed() -> None:
     """Install Chromium via Playwright if not already present."""
+    if os.path.exists(_CHROMIUM_SENTINEL):
+        return
     try:
         result = subprocess.run(
             [sys.executable, "-m", "playwright", "install", "--dry-run", "chromium"],
@@ -123,15 +313,28 @@ def _ensure_chromium_installed() -> None:
             )
     except (FileNotFoundError, subprocess.SubprocessError):
         # --dry-run not supported in older playwright versions; try launching directly
+        return
+    try:
+        os.makedirs(os.path.dirname(_CHROMIUM_SENTINEL), exist_ok=True)
+        open(_CHROMIUM_SENTINEL, "w").close()
+    except OSError:
         pass
 
 
 async def get_browser() -> Browser:
-    global _playwright, _browser
+    global _playwright, _browser, _chromium_checked
+    if not _chromium_checked:
+        # Run the subprocess probe in a worker thread, outside the launch
+        # lock so it never stalls browser reuse, but under its own lock so
+        # concurrent cold starts can't run two installs at once.
+        async with _get_install_lock():
+            if not _chromium_checked:
+                await asyncio.to_thread(_ensure_chromium_installed)
+                _chromium_checked = True
     async with _get_lock():
         if _browser is None:
-            _ensure_chromium_installed()
-            _playwright = await async_playwright().start()
+            if _playwright is None:
+                _playwright = await async_playwright().start()
             args = ["--disable-blink-features=AutomationControlled"]
             if os.environ.get("BROWSERFETCH_NO_SANDBOX") == "1":
                 args.append("--no-sandbox")
@@ -139,17 +342,84 @@ async def get_browser() -> Browser:
     return _browser
 
 
-async def new_page() -> Page:
+async def _release_page(browser: Browser | None) -> None:
+    """Count a finished page, retiring the browser past BROWSER_MAX_PAGES.
+
+    Closing the shared browser the moment the counter trips would kill the
+    pages other workers still have open on it. Instead the browser is only
+    retired here — _browser is cleared so the next get_browser() relaunches —
+    and the retired instance is closed once its last open page is released.
+    """
+    global _browser, _browser_page_count
+    if browser is None:
+        return
+    close_target = None
+    async with _get_lock():
+        remaining = _open_pages.get(browser, 1) - 1
+        _open_pages[browser] = remaining
+        if browser is _browser:
+            _browser_page_count += 1
+            if _browser_page_count >= BROWSER_MAX_PAGES:
+                _browser = None
+                _browser_page_count = 0
+        if remaining <= 0 and browser is not _browser:
+            del _open_pages[browser]
+            close_target = browser
+    if close_target is not None:
+        try:
+            await close_target.close()
+        except PlaywrightError:
+            pass
+
+
+# Analytics/ad hosts aborted for every page; they never contribute content.
+_TRACKER_RE = re.compile(
+    r"//[^/]*(?:google-analytics\.com|googletagmanager\.com|doubleclick\.net|"
+    r"connect\.facebook\.net|hotjar\.com|segment\.(?:io|com)|mixpanel\.com|"
+    r"scorecardresearch\.com|quantserve\.com)/"
+)
+
+# Resource types that are pure waste for text extraction.
+_TEXT_ONLY_BLOCKED_TYPES = frozenset({"image", "font", "media", "websocket"})
+
+
+async def new_page(block_media: bool = False) -> Page:
     browser = await get_browser()
-    context: BrowserContext = await browser.new_context(
-        user_agent=random.choice(USER_AGENTS),
-        viewport={"width": 1280, "height": 720},
-        locale="en-US",
-        accept_downloads=False,
-    )
-    await _stealth.apply_stealth_async(context)
-    page = await context.new_page()
-    return page
+    # Claimed before the first await so a concurrent retirement can never
+    # see this browser as drained while the context is still being built.
+    _open_pages[browser] = _open_pages.get(browser, 0) + 1
+    try:
+        context: BrowserContext = await browser.new_context(
+            user_agent=random.choice(USER_AGENTS),
+            viewport={"width": 1280, "height": 720},
+            locale="en-US",
+            accept_downloads=False,
+        )
+        blocked_types = _TEXT_ONLY_BLOCKED_TYPES if block_media else frozenset()
+
+        async def _route(route):
+            request = route.request
+            if request.resource_type in blocked_types or _TRACKER_RE.search(request.url):
+                await route.abort()
+            else:
+                await route.continue_()
+
+        # One handler per context (not per page) to keep route overhead amortized.
+        await context.route("**/*", _route)
+        await _get_stealth().apply_stealth_async(context)
+        page = await context.new_page()
+        return page
+    except BaseException:
+        await _release_page(browser)
+        raise
+
+
+def _get_stealth() -> "Stealth":
+    global _stealth
+    if _stealth is None:
+        from playwright_stealth import Stealth
+        _stealth = Stealth()
+    return _stealth
 
 
 # ---------------------------------------------------------------------------
@@ -194,94 +464,176 @@ def _is_fatal_nav_error(e: PlaywrightError) -> bool:
 # Public API
 # ---------------------------------------------------------------------------
 
-async def fetch_page(url: str, wait: float = 2.0, scroll: bool = True) -> FetchResult:
-    validate_url(url)
+async def fetch_page(url: str, wait: float = 2.0, scroll: bool = True,
+                     block_media: bool = True) -> FetchResult:
+    await validate_url(url)
     wait = max(0.0, min(wait, MAX_WAIT))
-    async with _get_semaphore():
-        page = await new_page()
-        try:
-            response = await _navigate(page, url)
-            status = response.status if response else 0
-            final_url = page.url
-            # Re-validate after redirects to prevent SSRF via redirect chain
-            if final_url != url:
-                validate_url(final_url)
-            await _dismiss_cookie_banner(page)
-            if wait > 0:
-                await page.wait_for_timeout(wait * 1000)
-            if scroll:
-                await _auto_scroll(page)
-            html = await page.content()
-            title = await page.title()
-            return FetchResult(html=html, url=final_url, status=status, title=title)
-        finally:
-            await page.context.close()
+    return await _run_queued(lambda: _fetch_page_job(url, wait, scroll, block_media))
+
+
+async def _fetch_page_job(url: str, wait: float, scroll: bool, block_media: bool) -> FetchResult:
+    page = await new_page(block_media=block_media)
+    try:
+        response = await _navigate(page, url)
+        status = response.status if response else 0
+        # Reject non-HTML from the navigation response headers rather than a
+        # separate pre-flight request; saves one network round-trip per fetch.
+        if response is not None:
+            ct = response.headers.get("content-type", "")
+            if ct and not any(t in ct for t in ("text/html", "text/plain", "application/xhtml")):
+                raise FetchError(f"URL content type is '{ct}', not a web page: {url}")
+        final_url = page.url
+        # Re-validate after redirects to prevent SSRF via redirect chain
+        if final_url != url:
+            await validate_url(final_url)
+        await _dismiss_cookie_banner(page)
+        if wait > 0:
+            await page.wait_for_timeout(wait * 1000)
+        if scroll:
+            await _auto_scroll(page)
+        # Independent round-trips; overlap them
+        html, title = await asyncio.gather(page.content(), page.title())
+        # Store as UTF-8 bytes: the downstream parsers consume bytes natively
+        # and byte length makes cache size accounting exact.
+        return FetchResult(html=html.encode("utf-8", "replace"),
+                           url=final_url, status=status, title=title)
+    finally:
+        browser = page.context.browser
+        await page.context.close()
+        await _release_page(browser)
 
 
 async def take_screenshot(url: str, full_page: bool = False) -> bytes:
-    validate_url(url)
-    async with _get_semaphore():
-        page = await new_page()
-        try:
-            await _navigate(page, url)
-            # Re-validate after redirects to prevent SSRF via redirect chain
-            final_url = page.url
-            if final_url != url:
-                validate_url(final_url)
-            await _dismiss_cookie_banner(page)
-            await page.wait_for_timeout(1000)
-            if full_page:
-                height = await page.evaluate("document.body.scrollHeight")
-                if height > MAX_SCREENSHOT_HEIGHT:
-                    await page.set_viewport_size({"width": 1280, "height": MAX_SCREENSHOT_HEIGHT})
-                    full_page = False
-            png = await page.screenshot(full_page=full_page, type="png")
-            if len(png) > MAX_SCREENSHOT_BYTES:
-                raise FetchError(f"Screenshot too large ({len(png) // 1024 // 1024}MB, limit is {MAX_SCREENSHOT_BYTES // 1024 // 1024}MB)")
-            return png
-        finally:
-            await page.context.close()
+    await validate_url(url)
+    return await _run_queued(lambda: _take_screenshot_job(url, full_page))
+
+
+async def _take_screenshot_job(url: str, full_page: bool) -> bytes:
+    page = await new_page()
+    try:
+        await _navigate(page, url)
+        # Re-validate after redirects to prevent SSRF via redirect chain
+        final_url = page.url
+        if final_url != url:
+            await validate_url(final_url)
+        await _dismiss_cookie_banner(page)
+        await page.wait_for_timeout(1000)
+        if full_page:
+            height = await page.evaluate("document.body.scrollHeight")
+            if height > MAX_SCREENSHOT_HEIGHT:
+                png = _maybe_recompress_png(await _capture_clipped(page, MAX_SCREENSHOT_HEIGHT))
+                if len(png) > MAX_SCREENSHOT_BYTES:
+                    raise FetchError(f"Screenshot too large ({len(png) // 1024 // 1024}MB, limit is {MAX_SCREENSHOT_BYTES // 1024 // 1024}MB)")
+                return png
+        png = _maybe_recompress_png(await page.screenshot(full_page=full_page, type="png"))
+        if len(png) > MAX_SCREENSHOT_BYTES:
+            raise FetchError(f"Screenshot too large ({len(png) // 1024 // 1024}MB, limit is {MAX_SCREENSHOT_BYTES // 1024 // 1024}MB)")
+        return png
+    finally:
+        browser = page.context.browser
+        await page.context.close()
+        await _release_page(browser)
+
+
+async def _get_http_session() -> "aiohttp.ClientSession":
+    """Return the shared aiohttp session, creating it on first use.
+
+    A single session reuses keep-alive connections and aiohttp's DNS cache
+    across head_check calls instead of paying a fresh TCP+TLS handshake and
+    lookup per request. The session is bound to the loop it was created on
+    (and .closed stays False after that loop dies), so it is rebuilt when
+    the running loop differs — same guard as _get_queue. The old session's
+    connections died with their loop; dropping the reference is all the
+    cleanup that remains.
+    """
+    global _http_session, _http_session_loop
+    import aiohttp
+    loop = asyncio.get_running_loop()
+    if _http_session is None or _http_session.closed or _http_session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=64, limit_per_host=8, ttl_dns_cache=300, use_dns_cache=True,
+        )
+        _http_session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=5),
+        )
+        _http_session_loop = loop
+    return _http_session
+
+
+def _maybe_recompress_png(png: bytes) -> bytes:
+    """Re-encode a screenshot PNG with pyvips when opted in.
+
+    Chromium's PNG encoder is conservative; a palettised re-encode typically
+    shrinks UI screenshots (few distinct colors) severalfold, which matters
+    because the bytes travel over MCP stdio. Opt-in via
+    BROWSERFETCH_OPTIMIZE_PNG=1 and the pyvips extra; otherwise, or if the
+    re-encode doesn't help, the original bytes pass through untouched.
+    """
+    if os.environ.get("BROWSERFETCH_OPTIMIZE_PNG") != "1":
+        return png
+    try:
+        import pyvips
+    except ImportError:
+        return png
+    try:
+        image = pyvips.Image.new_from_buffer(png, "")
+        smaller = image.pngsave_buffer(compression=9, palette=True, Q=90)
+    except Exception:
+        return png
+    return smaller if len(smaller) < len(png) else png
+
+
+async def _capture_clipped(page: Page, height: int) -> bytes:
+    """Screenshot the top of a too-tall page with one CDP message.
+
+    Resizing the viewport and re-shooting (the previous approach) forces two
+    full document re-layouts; an explicit clip with captureBeyondViewport
+    grabs the same region without touching layout at all.
+    """
+    cdp = await page.context.new_cdp_session(page)
+    try:
+        result = await cdp.send("Page.captureScreenshot", {
+            "format": "png",
+            "clip": {"x": 0, "y": 0, "width": 1280, "height": height, "scale": 1},
+            "captureBeyondViewport": True,
+        })
+    finally:
+        await cdp.detach()
+    return base64.b64decode(result["data"])
 
 
 async def head_check(url: str) -> None:
     """Quick HEAD request to detect non-HTML content before launching browser."""
-    validate_url(url)
+    await validate_url(url)
+    import aiohttp
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.head(url, timeout=aiohttp.ClientTimeout(total=5),
-                                    allow_redirects=True) as resp:
-                # Re-validate the final URL after redirects
+        session = await _get_http_session()
+        async with session.head(url, allow_redirects=True) as resp:
+            final_url = str(resp.url)
+            status = resp.status
+            ct = resp.headers.get("Content-Type", "")
+        if status in (403, 405, 501) or not ct:
+            # Many CDNs reject HEAD outright; retry as a GET for the first
+            # byte only, which reliably returns Content-Type and leaves a
+            # warm keep-alive connection behind instead of a wasted one.
+            async with session.get(url, headers={"Range": "bytes=0-0"},
+                                   allow_redirects=True) as resp:
                 final_url = str(resp.url)
-                if final_url != url:
-                    validate_url(final_url)
                 ct = resp.headers.get("Content-Type", "")
-                if ct and not any(t in ct for t in ["text/html", "text/plain", "application/xhtml"]):
-                    raise FetchError(
-                        f"URL content type is '{ct}', not a web page: {url}"
-                    )
+        # Re-validate the final URL after redirects
+        if final_url != url:
+            await validate_url(final_url)
+        if ct and not any(t in ct for t in ["text/html", "text/plain", "application/xhtml"]):
+            raise FetchError(
+                f"URL content type is '{ct}', not a web page: {url}"
+            )
     except (aiohttp.ClientError, asyncio.TimeoutError):
         pass  # let Playwright handle network errors
 
 
+# Accept buttons of common cookie-consent frameworks, by CSS selector.
+# These are precise enough to click unconditionally.
 COOKIE_ACCEPT_SELECTORS = [
-    # Common "Accept All" / "Accept" buttons by text
-    "button:has-text('Accept All')",
-    "button:has-text('Accept all')",
-    "button:has-text('Accept Cookies')",
-    "button:has-text('Accept cookies')",
-    "button:has-text('Allow All')",
-    "button:has-text('Allow all')",
-    "button:has-text('I Agree')",
-    "button:has-text('I agree')",
-    "button:has-text('Got it')",
-    "button:has-text('OK')",
-    # Common by ID / class / aria-label
-    "[id*='cookie'] button:has-text('Accept')",
-    "[class*='cookie'] button:has-text('Accept')",
-    "[id*='consent'] button:has-text('Accept')",
-    "[class*='consent'] button:has-text('Accept')",
-    "[aria-label*='cookie' i] button",
-    "[aria-label*='Accept' i][role='button']",
     # OneTrust (very common enterprise cookie manager)
     "#onetrust-accept-btn-handler",
     # Cookiebot
@@ -291,58 +643,166 @@ COOKIE_ACCEPT_SELECTORS = [
     "[data-testid='cookie-policy-dialog-accept-button']",
 ]
 
+# Generic consent-container selectors. These match every button in the
+# banner — including "Reject all" / "Manage settings" — so candidates are
+# additionally filtered by the accept-button labels below before clicking
+# (the querySelectorAll equivalent of the old :has-text('Accept')).
+COOKIE_GENERIC_SELECTORS = [
+    "[id*='cookie'] button",
+    "[class*='cookie'] button",
+    "[id*='consent'] button",
+    "[class*='consent'] button",
+    "[aria-label*='cookie' i] button",
+]
+
+# Generic "Accept" button labels, matched case-insensitively as substrings
+# in-page (like the :has-text selectors they replace), so variants such as
+# "Accept all cookies" or "Accept & continue" still match.
+COOKIE_ACCEPT_TEXTS = [
+    "accept all", "accept cookies", "accept", "allow all",
+    "i agree", "got it", "ok",
+]
+
+# Labels containing any of these are never clicked, even when an accept
+# text also matches as a substring ("cookie settings", "revoke" vs "ok").
+COOKIE_AVOID_TEXTS = [
+    "reject", "decline", "manage", "settings", "options",
+    "preferences", "customize", "customise", "revoke", "learn more",
+]
+
+# Banner containers removed from the DOM after accepting so they don't
+# pollute content extraction (banners often stay hidden in the DOM).
+COOKIE_BANNER_CONTAINERS = [
+    "#onetrust-banner-sdk", "#onetrust-consent-sdk",
+    "#CybotCookiebotDialog", "#cookiebanner",
+    ".qc-cmp2-container",
+    '[class*="cookie-banner"]', '[class*="cookie-consent"]',
+    '[class*="cookieBanner"]', '[class*="cookieConsent"]',
+    '[id*="cookie-banner"]', '[id*="cookie-consent"]',
+    '[id*="cookieBanner"]', '[id*="cookieConsent"]',
+    '[aria-label*="cookie" i]',
+]
+
+# Single in-page pass: find a visible accept button (precise framework
+# selectors first, then generic consent-container buttons filtered by
+# accept label, then a page-wide label scan), click it, and remove banner
+# containers. One CDP round-trip instead of one per selector.
+_COOKIE_DISMISS_JS = """(cfg) => {
+    const visible = (el) => {
+        if (!el || el.offsetParent === null) return false;
+        const r = el.getBoundingClientRect();
+        return r.width > 0 && r.height > 0;
+    };
+    const acceptLabel = (el) => {
+        const label = (el.textContent || '').trim().toLowerCase();
+        if (!label || label.length > 40) return false;
+        if (cfg.avoid.some(t => label.includes(t))) return false;
+        return cfg.texts.some(t => label.includes(t));
+    };
+    let target = null;
+    for (const sel of cfg.selectors) {
+        let els;
+        try { els = document.querySelectorAll(sel); } catch (e) { continue; }
+        for (const el of els) {
+            if (visible(el)) { target = el; break; }
+        }
+        if (target) break;
+    }
+    if (!target) {
+        for (const sel of cfg.genericSelectors) {
+            let els;
+            try { els = document.querySelectorAll(sel); } catch (e) { continue; }
+            for (const el of els) {
+                if (visible(el) && acceptLabel(el)) { target = el; break; }
+            }
+            if (target) break;
+        }
+    }
+    if (!target) {
+        for (const btn of document.querySelectorAll("button, [role='button']")) {
+            if (acceptLabel(btn) && visible(btn)) {
+                target = btn;
+                break;
+            }
+        }
+    }
+    if (!target) return false;
+    target.click();
+    for (const sel of cfg.containers) {
+        try { document.querySelectorAll(sel).forEach(el => el.remove()); } catch (e) {}
+    }
+    return true;
+}"""
+
 
 async def _dismiss_cookie_banner(page: Page) -> None:
     """Try to click a cookie consent 'Accept' button and remove banner from DOM."""
-    clicked = False
-    for selector in COOKIE_ACCEPT_SELECTORS:
-        try:
-            btn = page.locator(selector).first
-            if await btn.is_visible(timeout=200):
-                await btn.click(timeout=1000)
-                await page.wait_for_timeout(500)
-                clicked = True
-                break
-        except PlaywrightError:
-            continue
-
+    try:
+        clicked = await page.evaluate(_COOKIE_DISMISS_JS, {
+            "selectors": COOKIE_ACCEPT_SELECTORS,
+            "genericSelectors": COOKIE_GENERIC_SELECTORS,
+            "texts": COOKIE_ACCEPT_TEXTS,
+            "avoid": COOKIE_AVOID_TEXTS,
+            "containers": COOKIE_BANNER_CONTAINERS,
+        })
+    except PlaywrightError:
+        return
     if clicked:
-        # Remove common cookie banner containers from the DOM so they don't
-        # pollute content extraction (banners often stay hidden in the DOM).
-        await page.evaluate("""() => {
-            const selectors = [
-                '#onetrust-banner-sdk', '#onetrust-consent-sdk',
-                '#CybotCookiebotDialog', '#cookiebanner',
-                '.qc-cmp2-container',
-                '[class*="cookie-banner"]', '[class*="cookie-consent"]',
-                '[class*="cookieBanner"]', '[class*="cookieConsent"]',
-                '[id*="cookie-banner"]', '[id*="cookie-consent"]',
-                '[id*="cookieBanner"]', '[id*="cookieConsent"]',
-                '[aria-label*="cookie" i]',
-            ];
-            for (const sel of selectors) {
-                document.querySelectorAll(sel).forEach(el => el.remove());
-            }
-        }""")
+        await page.wait_for_timeout(500)
+
+
+# Scroll-until-stable loop run entirely in-page: one CDP round-trip instead
+# of an evaluate + key press + timeout per step.
+_AUTO_SCROLL_JS = """async ([maxScrolls, settleMs]) => {
+    let prev = -1;
+    for (let i = 0; i < maxScrolls; i++) {
+        const height = document.body.scrollHeight;
+        if (height === prev) break;
+        prev = height;
+        window.scrollBy(0, window.innerHeight);
+        await new Promise(r => setTimeout(r, settleMs));
+    }
+    window.scrollTo(0, 0);
+}"""
 
 
 async def _auto_scroll(page: Page, max_scrolls: int = 10):
-    prev_height = 0
-    for _ in range(max_scrolls):
-        height = await page.evaluate("document.body.scrollHeight")
-        if height == prev_height:
-            break
-        prev_height = height
-        await page.keyboard.press("PageDown")
-        await page.wait_for_timeout(500)
-    await page.evaluate("window.scrollTo(0, 0)")
+    try:
+        await page.evaluate(_AUTO_SCROLL_JS, [max_scrolls, 300])
+    except PlaywrightError:
+        pass  # page may have navigated away mid-scroll
 
 
 async def shutdown():
-    global _playwright, _browser
+    global _playwright, _browser, _http_session, _http_session_loop, \
+        _work_queue, _workers, _queue_loop
+    for worker in _workers:
+        worker.cancel()
+    # Jobs still queued would leave their callers awaiting forever in
+    # _run_queued; cancel their futures so those callers unblock. Workers
+    # cancelled mid-job cancel the future they hold themselves.
+    if _work_queue is not None:
+        while not _work_queue.empty():
+            future, _ = _work_queue.get_nowait()
+            if not future.done():
+                future.cancel()
+    _workers = []
+    _work_queue = None
+    _queue_loop = None
+    if _http_session and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+    _http_session_loop = None
     if _browser:
         await _browser.close()
         _browser = None
+    # Retired browsers still draining their last pages
+    for retired in list(_open_pages):
+        try:
+            await retired.close()
+        except PlaywrightError:
+            pass
+    _open_pages.clear()
     if _playwright:
         await _playwright.stop()
         _playwright = None
@@ -1,96 +1,98 @@
+import re
+from functools import lru_cache
 from urllib.parse import urljoin
-from bs4 import BeautifulSoup, Tag
-import minify_html
+from selectolax.parser import HTMLParser, Node
 import inscriptis
+from inscriptis.model.config import ParserConfig
 import trafilatura
 
+# urljoin re-parses the base URL on every call; pages repeat the same
+# (base, href) pairs constantly (nav links, pagination, repeated assets),
+# so memoizing the join skips the redundant parsing on the hottest loop.
+_urljoin = lru_cache(maxsize=2048)(urljoin)
 
-def html_to_text(html: str, base_url: str = "") -> str:
-    soup = BeautifulSoup(html, "html.parser")
+# Runs of 3+ newlines (possibly with trailing spaces/tabs on the blank lines)
+# collapse to a single blank line.
+_EXCESS_BLANKS = re.compile(r"\n[ \t]*\n(?:[ \t]*\n)+")
+
+# Tags that never contribute readable text
+_STRIP_SELECTOR = "script, style, nav, footer, header, noscript, svg"
+
+# inscriptis builds a fresh ParserConfig (CSS profile and all) on every
+# get_text call when none is passed; share one instead.
+_INSCRIPTIS_CONFIG = ParserConfig()
+
+
+def html_to_text(html: bytes | str, base_url: str = "") -> str:
+    tree = HTMLParser(html)
 
     # Remove unwanted tags
-    for tag in soup.find_all(["script", "style", "nav", "footer", "header", "noscript", "svg"]):
-        tag.decompose()
+    for node in tree.css(_STRIP_SELECTOR):
+        node.decompose()
 
     # Process tables -> markdown
-    for table in soup.find_all("table"):
-        md = _table_to_markdown(table)
-        table.replace_with(soup.new_string(md))
+    for table in tree.css("table"):
+        table.replace_with(_table_to_markdown(table))
 
     # Process links -> markdown
-    for a in soup.find_all("a"):
-        href = a.get("href", "")
-        text = a.get_text(strip=True)
+    for a in tree.css("a"):
+        href = a.attributes.get("href") or ""
+        text = a.text(deep=True, strip=True)
         if href and text:
-            abs_url = urljoin(base_url, href) if base_url else href
-            a.replace_with(soup.new_string(f"[{text}]({abs_url})"))
+            abs_url = _urljoin(base_url, href) if base_url else href
+            a.replace_with(f"[{text}]({abs_url})")
         elif text:
-            a.replace_with(soup.new_string(text))
+            a.replace_with(text)
 
     # Process images -> markdown
-    for img in soup.find_all("img"):
-        alt = img.get("alt", "")
-        src = img.get("src") or img.get("data-src") or _srcset_first(img.get("srcset", ""))
+    for img in tree.css("img"):
+        attrs = img.attributes
+        alt = attrs.get("alt") or ""
+        src = attrs.get("src") or attrs.get("data-src") or _srcset_first(attrs.get("srcset") or "")
         if src:
-            abs_src = urljoin(base_url, src) if base_url else src
-            img.replace_with(soup.new_string(f"![{alt}]({abs_src})"))
+            abs_src = _urljoin(base_url, src) if base_url else src
+            img.replace_with(f"![{alt}]({abs_src})")
         else:
             img.decompose()
 
-    # Minify remaining HTML, then extract text
-    remaining = str(soup)
-    try:
-        remaining = minify_html.minify(remaining, minify_css=True, minify_js=True)
-    except Exception:
-        pass
-
-    text = inscriptis.get_text(remaining)
+    # Serialize once and extract text. No minify pass: scripts/styles are
+    # already gone and inscriptis doesn't care about whitespace in markup.
+    text = inscriptis.get_text(tree.html or "", _INSCRIPTIS_CONFIG)
 
     # Clean up excessive blank lines
-    lines = text.splitlines()
-    cleaned = []
-    blank_count = 0
-    for line in lines:
-        if line.strip() == "":
-            blank_count += 1
-            if blank_count <= 2:
-                cleaned.append("")
-        else:
-            blank_count = 0
-            cleaned.append(line)
+    return _EXCESS_BLANKS.sub("\n\n", text).strip()
+
 
-    return "\n".join(cleaned).strip()
+# Escape table for cell text; one C-level translate pass instead of a
+# .replace scan per cell
+_PIPE_ESCAPE = str.maketrans({"|": "\\|"})
 
 
-def _table_to_markdown(table: Tag) -> str:
-    rows = []
-    for tr in table.find_all("tr"):
-        cells = []
-        for td in tr.find_all(["td", "th"]):
-            cells.append(td.get_text(strip=True).replace("|", "\\|"))
-        if cells:
-            rows.append(cells)
+def _table_to_markdown(table: Node) -> str:
+    rows = [
+        [td.text(deep=True, strip=True).translate(_PIPE_ESCAPE) for td in tr.css("td, th")]
+        for tr in table.css("tr")
+    ]
+    rows = [r for r in rows if r]
 
     if not rows:
         return ""
 
     # Normalize column count
-    max_cols = max(len(r) for r in rows)
-    for r in rows:
-        while len(r) < max_cols:
-            r.append("")
+    max_cols = max(map(len, rows))
+    rows = [r + [""] * (max_cols - len(r)) for r in rows]
 
-    lines = []
     # First row as header
-    lines.append("| " + " | ".join(rows[0]) + " |")
-    lines.append("| " + " | ".join("---" for _ in rows[0]) + " |")
-    for row in rows[1:]:
-        lines.append("| " + " | ".join(row) + " |")
+    lines = [
+        "| " + " | ".join(rows[0]) + " |",
+        "| " + " | ".join(["---"] * max_cols) + " |",
+    ]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows[1:])
 
     return "\n" + "\n".join(lines) + "\n"
 
 
-def extract_main_content(html: str, base_url: str = "") -> str:
+def extract_main_content(html: bytes | str, base_url: str = "") -> str:
     """Extract just the main article/content using trafilatura."""
     result = trafilatura.extract(
         html,
@@ -1,43 +1,115 @@
 import asyncio
 import sys
-import time
+from collections import OrderedDict
+from dataclasses import dataclass
+# Bound once: skips the attribute lookup per cache touch, and monotonic time
+# keeps TTL arithmetic immune to wall-clock (NTP) jumps in long-lived servers.
+from time import monotonic as _now
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp.utilities.types import Image
-from fetch import fetch_page, take_screenshot, head_check, shutdown, FetchError, FetchResult
+from fetch import (fetch_page, take_screenshot, head_check, reject_url, shutdown,
+                   FetchError, FetchResult)
 from process import html_to_text, extract_main_content
 
 mcp = FastMCP("browserfetch")
 
-# Simple TTL cache: {url: (timestamp, FetchResult)}
-_cache: dict[str, tuple[float, FetchResult]] = {}
+@dataclass(slots=True)
+class _Entry:
+    """One cache entry; slotted so entries carry no per-instance __dict__."""
+    ts: float
+    size: int
+    result: FetchResult
+
+
+# Simple LRU+TTL cache. The HTML byte size is computed once at insert and a
+# running total is kept, so size checks never re-encode or re-scan the cached
+# entries. OrderedDict makes touch/insert/evict all O(1).
+_cache: OrderedDict[str, _Entry] = OrderedDict()
+_cache_total_bytes = 0
 _CACHE_TTL = 300  # 5 minutes
 _CACHE_MAX_ENTRIES = 20
 _CACHE_MAX_BYTES = 50 * 1024 * 1024  # 50 MB total HTML in cache
 
 MAX_CHARS_LIMIT = 500_000
 
+# Prebuilt %-template: the truncation suffix is formatted on every oversized
+# page, and %-interpolation into a constant skips re-parsing an f-string spec.
+_TRUNC_TMPL = "\n\n[Truncated — %d total characters, showing first %d]"
+
+# In-flight fetches keyed by URL so concurrent requests for the same page
+# share one browser navigation (single-flight) instead of racing it twice.
+_inflight: dict[str, asyncio.Future] = {}
+
 
 def _cache_size_bytes() -> int:
-    return sum(len(r.html.encode("utf-8", errors="replace")) for _, r in _cache.values())
+    return _cache_total_bytes
+
+
+# Second tier: processed text keyed by (url, readability), so a repeat call
+# with the same flag skips the CPU-bound extraction, not just the fetch.
+# Values hold the assembled header prefix (trailing separator included, ""
+# when headerless) next to the body, so a hit is a lookup plus a slice.
+_text_cache: OrderedDict[tuple[str, bool], tuple[float, str, str]] = OrderedDict()
+_TEXT_CACHE_MAX_ENTRIES = 40
 
 
 def _get_cached(url: str) -> FetchResult | None:
-    if url in _cache:
-        ts, result = _cache[url]
-        if time.time() - ts < _CACHE_TTL:
-            return result
-        del _cache[url]
+    global _cache_total_bytes
+    entry = _cache.get(url)
+    if entry is None:
+        return None
+    if _now() - entry.ts < _CACHE_TTL:
+        _cache.move_to_end(url)
+        return entry.result
+    del _cache[url]
+    _cache_total_bytes -= entry.size
+    # Text derived from the expired HTML goes with it
+    _text_cache.pop((url, True), None)
+    _text_cache.pop((url, False), None)
     return None
 
 
+def _get_cached_text(key: tuple[str, bool]) -> tuple[str, str] | None:
+    entry = _text_cache.get(key)
+    if entry is None:
+        return None
+    ts, header, text = entry
+    if _now() - ts < _CACHE_TTL:
+        _text_cache.move_to_end(key)
+        return header, text
+    del _text_cache[key]
+    return None
+
+
+def _set_cached_text(key: tuple[str, bool], header: str, text: str) -> None:
+    _text_cache[key] = (_now(), header, text)
+    while len(_text_cache) > _TEXT_CACHE_MAX_ENTRIES:
+        _text_cache.popitem(last=False)
+
+
 def _set_cached(url: str, result: FetchResult) -> None:
-    _cache[url] = (time.time(), result)
-    # Evict oldest entries if over limits (dict maintains insertion order)
-    while len(_cache) > _CACHE_MAX_ENTRIES or _cache_size_bytes() > _CACHE_MAX_BYTES:
-        if not _cache:
-            break
-        oldest_key = next(iter(_cache))
-        del _cache[oldest_key]
+    global _cache_total_bytes
+    size = len(result.html)  # html is UTF-8 bytes, so len() is the byte size
+    old = _cache.pop(url, None)
+    if old is not None:
+        _cache_total_bytes -= old.size
+    _cache[url] = _Entry(_now(), size, result)
+    _cache_total_bytes += size
+    # Evict least-recently-used entries if over limits
+    while _cache and (len(_cache) > _CACHE_MAX_ENTRIES or _cache_total_bytes > _CACHE_MAX_BYTES):
+        evicted_url, evicted = _cache.popitem(last=False)
+        _cache_total_bytes -= evicted.size
+        # Text derived from the evicted HTML goes with it, or a later fetch
+        # of the same URL would serve stale pre-eviction text
+        _text_cache.pop((evicted_url, True), None)
+        _text_cache.pop((evicted_url, False), None)
+
+
+def _clear_cache() -> None:
+    global _cache_total_bytes
+    _cache.clear()
+    _text_cache.clear()
+    _cache_total_bytes = 0
 
 
 @mcp.tool()
@@ -55,41 +127,72 @@ async def fetch(url: str, wait: float = 2.0, scroll: bool = True,
         max_chars: Maximum characters to return (default 40000, max 500000). Set to 0 for max.
         readability: Extract only the main article content, removing boilerplate (default True). Set to False for homepages or index pages where you want everything.
     """
-    # Cap max_chars to prevent memory exhaustion
-    if max_chars <= 0 or max_chars > MAX_CHARS_LIMIT:
-        max_chars = MAX_CHARS_LIMIT
+    # Effective character budget, computed once: 0 or anything above the cap
+    # means the cap (which also prevents memory exhaustion)
+    budget = min(max_chars if max_chars > 0 else MAX_CHARS_LIMIT, MAX_CHARS_LIMIT)
 
+    # Obviously invalid URLs return here, skipping the cache, the in-flight
+    # future, and raise/unwind overhead on a path that can never succeed.
+    if (err := reject_url(url)) is not None:
+        return f"Error: {err}"
+
+    # No separate head_check here: fetch_page rejects non-HTML from the
+    # navigation response itself, saving a pre-flight round-trip.
     try:
-        await head_check(url)
         cached = _get_cached(url)
         if cached:
             result = cached
+        elif (fut := _inflight.get(url)) is not None:
+            result = await fut
         else:
-            result = await fetch_page(url, wait=wait, scroll=scroll)
-            _set_cached(url, result)
+            fut = asyncio.get_running_loop().create_future()
+            _inflight[url] = fut
+            try:
+                result = await fetch_page(url, wait=wait, scroll=scroll)
+            except BaseException as e:
+                fut.set_exception(e)
+                fut.exception()  # mark retrieved in case no one else is waiting
+                raise
+            else:
+                fut.set_result(result)
+                _set_cached(url, result)
+            finally:
+                _inflight.pop(url, None)
     except FetchError as e:
         return f"Error: {e}"
     except Exception as e:
         return f"Error: unexpected failure fetching {url}: {e}"
 
-    if readability:
-        text = extract_main_content(result.html, base_url=result.url)
+    text_key = (url, readability)
+    cached_text = _get_cached_text(text_key)
+    if cached_text is not None:
+        header, text = cached_text
     else:
-        text = html_to_text(result.html, base_url=result.url)
-
-    # Build header with metadata
-    header_parts = [f"Title: {result.title}"] if result.title else []
-    if result.url != url:
-        header_parts.append(f"Redirected to: {result.url}")
-    if result.status and result.status >= 400:
-        header_parts.append(f"HTTP {result.status}")
-    header = "\n".join(header_parts)
-    if header:
-        text = header + "\n\n" + text
-
-    if len(text) > max_chars:
-        text = text[:max_chars] + f"\n\n[Truncated — {len(text)} total characters, showing first {max_chars}]"
-    return text
+        # Extraction is CPU-bound (full DOM parse + heuristics, 100-500ms on
+        # big pages); run it in a worker thread so concurrent fetches keep
+        # moving.
+        if readability:
+            text = await asyncio.to_thread(extract_main_content, result.html, base_url=result.url)
+        else:
+            text = await asyncio.to_thread(html_to_text, result.html, base_url=result.url)
+
+        # Build header with metadata
+        header_parts = [f"Title: {result.title}"] if result.title else []
+        if result.url != url:
+            header_parts.append(f"Redirected to: {result.url}")
+        if result.status and result.status >= 400:
+            header_parts.append(f"HTTP {result.status}")
+        header = "\n".join(header_parts) + "\n\n" if header_parts else ""
+        _set_cached_text(text_key, header, text)
+
+    # Slice before assembly so an oversized body never gets copied whole,
+    # then join once instead of concatenating intermediates.
+    if len(text) > budget:
+        suffix = _TRUNC_TMPL % (len(text), budget)
+        text = text[:budget]
+    else:
+        suffix = ""
+    return "".join((header, text, suffix))
 
 
 @mcp.tool()
@@ -112,8 +215,26 @@ async def screenshot(url: str, full_page: bool = False) -> Image:
     return Image(data=png_bytes, format="png")
 
 
+def _cleanup() -> None:
+    """Release browser/session resources at process exit.
+
+    If a loop is somehow still running here (e.g. under a test runner),
+    starting a second one with asyncio.run would raise — skip instead and
+    let that loop's owner drive shutdown(). Failures are swallowed: at
+    this point the process is exiting and a hang would be worse than a
+    leaked handle.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        try:
+            asyncio.run(shutdown())
+        except Exception:
+            pass
+
+
 if __name__ == "__main__":
     try:
         mcp.run(transport="stdio")
     finally:
-        asyncio.run(shutdown())
+        _cleanup()
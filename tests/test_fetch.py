@@ -18,7 +18,7 @@ class TestFetchPage:
         assert result.status == 200
         assert "Example Domain" in result.title
         assert result.url == "https://example.com/"
-        assert "<html" in result.html.lower()
+        assert b"<html" in result.html.lower()
 
     @pytest.mark.asyncio
     async def test_fetch_rejects_private_ip(self):
@@ -1,4 +1,5 @@
 """Tests for server.py — cache logic, truncation, and error handling."""
+import asyncio
 import time
 from unittest.mock import AsyncMock, patch, MagicMock
 import pytest
@@ -12,14 +13,14 @@ from server import _get_cached, _set_cached, _cache, _CACHE_TTL, MAX_CHARS_LIMIT
 @pytest.fixture(autouse=True)
 def clear_cache():
     """Clear the cache before each test."""
-    _cache.clear()
+    server._clear_cache()
     yield
-    _cache.clear()
+    server._clear_cache()
 
 
 class TestCache:
     def test_set_and_get(self):
-        result = FetchResult(html="<p>hi</p>", url="https://example.com", status=200, title="Hi")
+        result = FetchResult(html=b"<p>hi</p>", url="https://example.com", status=200, title="Hi")
         _set_cached("https://example.com", result)
         cached = _get_cached("https://example.com")
         assert cached is result
@@ -28,32 +29,39 @@ class TestCache:
         assert _get_cached("https://notcached.com") is None
 
     def test_expired_entry_returns_none(self):
-        result = FetchResult(html="<p>old</p>", url="https://example.com", status=200, title="Old")
+        result = FetchResult(html=b"<p>old</p>", url="https://example.com", status=200, title="Old")
         _set_cached("https://example.com", result)
         # Manually expire the entry
-        ts, r = _cache["https://example.com"]
-        _cache["https://example.com"] = (ts - _CACHE_TTL - 1, r)
+        _cache["https://example.com"].ts -= _CACHE_TTL + 1
         assert _get_cached("https://example.com") is None
         assert "https://example.com" not in _cache
 
     def test_evicts_oldest_when_max_entries_exceeded(self):
         for i in range(25):
-            r = FetchResult(html=f"<p>{i}</p>", url=f"https://example.com/{i}", status=200, title=str(i))
+            r = FetchResult(html=f"<p>{i}</p>".encode(), url=f"https://example.com/{i}", status=200, title=str(i))
             _set_cached(f"https://example.com/{i}", r)
         assert len(_cache) <= 20
 
     def test_evicts_when_cache_bytes_exceeded(self):
         # Create a result with ~10MB of HTML
-        big_html = "x" * (10 * 1024 * 1024)
+        big_html = b"x" * (10 * 1024 * 1024)
         for i in range(7):
             r = FetchResult(html=big_html, url=f"https://example.com/{i}", status=200, title=str(i))
             _set_cached(f"https://example.com/{i}", r)
         total_bytes = server._cache_size_bytes()
         assert total_bytes <= server._CACHE_MAX_BYTES
 
+    def test_eviction_drops_derived_text(self):
+        server._set_cached_text(("https://example.com/0", True), "", "old text")
+        for i in range(25):
+            r = FetchResult(html=f"<p>{i}</p>".encode(), url=f"https://example.com/{i}", status=200, title=str(i))
+            _set_cached(f"https://example.com/{i}", r)
+        # /0 was evicted, so its processed text must not survive it
+        assert server._get_cached_text(("https://example.com/0", True)) is None
+
     def test_eviction_uses_fifo_order(self):
         for i in range(22):
-            r = FetchResult(html=f"<p>{i}</p>", url=f"https://example.com/{i}", status=200, title=str(i))
+            r = FetchResult(html=f"<p>{i}</p>".encode(), url=f"https://example.com/{i}", status=200, title=str(i))
             _set_cached(f"https://example.com/{i}", r)
         # First entries should have been evicted
         assert _get_cached("https://example.com/0") is None
@@ -66,7 +74,7 @@ class TestMaxChars:
     @pytest.mark.asyncio
     async def test_max_chars_caps_at_limit(self):
         long_text = "A" * 600_000
-        result = FetchResult(html=f"<p>{long_text}</p>", url="https://example.com", status=200, title="Big")
+        result = FetchResult(html=f"<p>{long_text}</p>".encode(), url="https://example.com", status=200, title="Big")
 
         with patch("server.head_check", new_callable=AsyncMock), \
              patch("server.fetch_page", new_callable=AsyncMock, return_value=result), \
@@ -78,7 +86,7 @@ class TestMaxChars:
     @pytest.mark.asyncio
     async def test_max_chars_over_limit_is_capped(self):
         long_text = "B" * 600_000
-        result = FetchResult(html=f"<p>{long_text}</p>", url="https://example.com", status=200, title="Big")
+        result = FetchResult(html=f"<p>{long_text}</p>".encode(), url="https://example.com", status=200, title="Big")
 
         with patch("server.head_check", new_callable=AsyncMock), \
              patch("server.fetch_page", new_callable=AsyncMock, return_value=result), \
@@ -89,7 +97,7 @@ class TestMaxChars:
     @pytest.mark.asyncio
     async def test_truncation_message_included(self):
         text_100 = "C" * 100
-        result = FetchResult(html="<p>x</p>", url="https://example.com", status=200, title="")
+        result = FetchResult(html=b"<p>x</p>", url="https://example.com", status=200, title="")
 
         with patch("server.head_check", new_callable=AsyncMock), \
              patch("server.fetch_page", new_callable=AsyncMock, return_value=result), \
@@ -102,20 +110,20 @@ class TestMaxChars:
 class TestFetchTool:
     @pytest.mark.asyncio
     async def test_returns_error_on_fetch_error(self):
-        with patch("server.head_check", new_callable=AsyncMock, side_effect=FetchError("blocked")):
+        with patch("server.fetch_page", new_callable=AsyncMock, side_effect=FetchError("blocked")):
             text = await server.fetch("https://example.com")
             assert text == "Error: blocked"
 
     @pytest.mark.asyncio
     async def test_returns_error_on_unexpected_exception(self):
-        with patch("server.head_check", new_callable=AsyncMock, side_effect=RuntimeError("boom")):
+        with patch("server.fetch_page", new_callable=AsyncMock, side_effect=RuntimeError("boom")):
             text = await server.fetch("https://example.com")
             assert "unexpected failure" in text
             assert "boom" in text
 
     @pytest.mark.asyncio
     async def test_metadata_header_with_redirect(self):
-        result = FetchResult(html="<p>hi</p>", url="https://other.com", status=200, title="Other")
+        result = FetchResult(html=b"<p>hi</p>", url="https://other.com", status=200, title="Other")
 
         with patch("server.head_check", new_callable=AsyncMock), \
              patch("server.fetch_page", new_callable=AsyncMock, return_value=result), \
@@ -126,7 +134,7 @@ class TestFetchTool:
 
     @pytest.mark.asyncio
     async def test_metadata_header_with_error_status(self):
-        result = FetchResult(html="<p>not found</p>", url="https://example.com", status=404, title="Not Found")
+        result = FetchResult(html=b"<p>not found</p>", url="https://example.com", status=404, title="Not Found")
 
         with patch("server.head_check", new_callable=AsyncMock), \
              patch("server.fetch_page", new_callable=AsyncMock, return_value=result), \
@@ -136,7 +144,7 @@ class TestFetchTool:
 
     @pytest.mark.asyncio
     async def test_readability_false_uses_html_to_text(self):
-        result = FetchResult(html="<p>hello</p>", url="https://example.com", status=200, title="")
+        result = FetchResult(html=b"<p>hello</p>", url="https://example.com", status=200, title="")
 
         with patch("server.head_check", new_callable=AsyncMock), \
              patch("server.fetch_page", new_callable=AsyncMock, return_value=result), \
@@ -149,7 +157,7 @@ class TestFetchTool:
 
     @pytest.mark.asyncio
     async def test_uses_cache_on_second_call(self):
-        result = FetchResult(html="<p>hi</p>", url="https://example.com", status=200, title="Hi")
+        result = FetchResult(html=b"<p>hi</p>", url="https://example.com", status=200, title="Hi")
 
         with patch("server.head_check", new_callable=AsyncMock), \
              patch("server.fetch_page", new_callable=AsyncMock, return_value=result) as mock_fp, \
@@ -159,6 +167,35 @@ class TestFetchTool:
             # fetch_page should only be called once; second call uses cache
             assert mock_fp.call_count == 1
 
+    @pytest.mark.asyncio
+    async def test_text_cache_skips_reextraction(self):
+        result = FetchResult(html=b"<p>hi</p>", url="https://example.com", status=200, title="Hi")
+
+        with patch("server.head_check", new_callable=AsyncMock), \
+             patch("server.fetch_page", new_callable=AsyncMock, return_value=result), \
+             patch("server.extract_main_content", return_value="hi") as mock_emc:
+            await server.fetch("https://example.com")
+            await server.fetch("https://example.com")
+            # Second call hits the processed-text cache, skipping extraction
+            assert mock_emc.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_fetches_coalesce(self):
+        result = FetchResult(html=b"<p>hi</p>", url="https://example.com", status=200, title="Hi")
+
+        async def slow_fetch(url, **kwargs):
+            await asyncio.sleep(0.05)
+            return result
+
+        with patch("server.head_check", new_callable=AsyncMock), \
+             patch("server.fetch_page", side_effect=slow_fetch) as mock_fp, \
+             patch("server.extract_main_content", return_value="hi"):
+            texts = await asyncio.gather(server.fetch("https://example.com"),
+                                         server.fetch("https://example.com"))
+            # Both callers share one navigation via the in-flight future
+            assert mock_fp.call_count == 1
+            assert all("hi" in t for t in texts)
+
 
 class TestScreenshotTool:
     @pytest.mark.asyncio
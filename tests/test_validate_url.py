@@ -2,99 +2,177 @@
 import ipaddress
 from unittest.mock import patch
 import pytest
-from fetch import validate_url, _check_hostname, FetchError
+import fetch
+from fetch import validate_url, reject_url, _check_hostname, FetchError
+
+
+@pytest.fixture(autouse=True)
+def clear_dns_cache():
+    """Clear the DNS cache so tests don't see each other's resolutions."""
+    fetch._dns_cache.clear()
+    yield
+    fetch._dns_cache.clear()
 
 
 class TestValidateUrl:
-    def test_allows_http(self):
-        validate_url("http://example.com")
+    @pytest.mark.asyncio
+    async def test_allows_http(self):
+        await validate_url("http://example.com")
 
-    def test_allows_https(self):
-        validate_url("https://example.com")
+    @pytest.mark.asyncio
+    async def test_allows_https(self):
+        await validate_url("https://example.com")
 
-    def test_rejects_file_scheme(self):
+    @pytest.mark.asyncio
+    async def test_rejects_file_scheme(self):
         with pytest.raises(FetchError, match="Only http and https"):
-            validate_url("file:///etc/passwd")
+            await validate_url("file:///etc/passwd")
 
-    def test_rejects_ftp_scheme(self):
+    @pytest.mark.asyncio
+    async def test_rejects_ftp_scheme(self):
         with pytest.raises(FetchError, match="Only http and https"):
-            validate_url("ftp://example.com/file.txt")
+            await validate_url("ftp://example.com/file.txt")
 
-    def test_rejects_javascript_scheme(self):
+    @pytest.mark.asyncio
+    async def test_rejects_javascript_scheme(self):
         with pytest.raises(FetchError, match="Only http and https"):
-            validate_url("javascript:alert(1)")
+            await validate_url("javascript:alert(1)")
 
-    def test_rejects_data_scheme(self):
+    @pytest.mark.asyncio
+    async def test_rejects_data_scheme(self):
         with pytest.raises(FetchError, match="Only http and https"):
-            validate_url("data:text/html,<h1>hi</h1>")
+            await validate_url("data:text/html,<h1>hi</h1>")
 
-    def test_rejects_no_hostname(self):
+    @pytest.mark.asyncio
+    async def test_rejects_no_hostname(self):
         with pytest.raises(FetchError, match="no hostname"):
-            validate_url("http://")
+            await validate_url("http://")
 
-    def test_rejects_localhost(self):
+    @pytest.mark.asyncio
+    async def test_rejects_localhost(self):
         with pytest.raises(FetchError, match="private/internal"):
-            validate_url("http://localhost/")
+            await validate_url("http://localhost/")
 
-    def test_rejects_127_0_0_1(self):
+    @pytest.mark.asyncio
+    async def test_rejects_127_0_0_1(self):
         with pytest.raises(FetchError, match="private/internal"):
-            validate_url("http://127.0.0.1/")
+            await validate_url("http://127.0.0.1/")
 
-    def test_rejects_10_x(self):
+    @pytest.mark.asyncio
+    async def test_rejects_10_x(self):
         with pytest.raises(FetchError, match="private/internal"):
-            validate_url("http://10.0.0.1/")
+            await validate_url("http://10.0.0.1/")
 
-    def test_rejects_172_16_x(self):
+    @pytest.mark.asyncio
+    async def test_rejects_172_16_x(self):
         with pytest.raises(FetchError, match="private/internal"):
-            validate_url("http://172.16.0.1/")
+            await validate_url("http://172.16.0.1/")
 
-    def test_rejects_192_168_x(self):
+    @pytest.mark.asyncio
+    async def test_rejects_192_168_x(self):
         with pytest.raises(FetchError, match="private/internal"):
-            validate_url("http://192.168.1.1/")
+            await validate_url("http://192.168.1.1/")
 
-    def test_rejects_169_254_x(self):
+    @pytest.mark.asyncio
+    async def test_rejects_169_254_x(self):
         with pytest.raises(FetchError, match="private/internal"):
-            validate_url("http://169.254.169.254/latest/meta-data/")
+            await validate_url("http://169.254.169.254/latest/meta-data/")
 
-    def test_rejects_unresolvable_domain(self):
+    @pytest.mark.asyncio
+    async def test_rejects_unresolvable_domain(self):
         with pytest.raises(FetchError, match="Could not resolve"):
-            validate_url("http://thisdomaindoesnotexist12345abc.invalid/")
+            await validate_url("http://thisdomaindoesnotexist12345abc.invalid/")
+
+    @pytest.mark.asyncio
+    async def test_allows_public_domain(self):
+        await validate_url("https://example.com")
 
-    def test_allows_public_domain(self):
-        validate_url("https://example.com")
+    @pytest.mark.asyncio
+    async def test_allows_public_domain_with_path(self):
+        await validate_url("https://en.wikipedia.org/wiki/Main_Page")
+
+
+class TestRejectUrl:
+    """reject_url screens without DNS — only face-value failures reject."""
+
+    def test_rejects_bad_scheme(self):
+        assert "Only http and https" in reject_url("file:///etc/passwd")
+
+    def test_rejects_missing_hostname(self):
+        assert "no hostname" in reject_url("http://")
+
+    def test_rejects_literal_private_ip(self):
+        assert "private/internal" in reject_url("http://127.0.0.1/secret")
+
+    def test_passes_hostnames_through(self):
+        # Hostnames need resolution to judge, even unresolvable ones
+        assert reject_url("https://example.com") is None
+        assert reject_url("https://doesnotexist.invalid") is None
+
+
+class TestDNSCache:
+    @pytest.mark.asyncio
+    async def test_caches_resolutions(self):
+        fake_info = [(10, 1, 6, '', ('93.184.216.34', 80, 0, 0))]
+        with patch("fetch.socket.getaddrinfo", return_value=fake_info) as mock_gai:
+            await _check_hostname("cached.example.com")
+            await _check_hostname("cached.example.com")
+            assert mock_gai.call_count == 1
 
-    def test_allows_public_domain_with_path(self):
-        validate_url("https://en.wikipedia.org/wiki/Main_Page")
+    @pytest.mark.asyncio
+    async def test_caches_resolution_failures(self):
+        import socket
+        with patch("fetch.socket.getaddrinfo", side_effect=socket.gaierror) as mock_gai:
+            with pytest.raises(FetchError, match="Could not resolve"):
+                await _check_hostname("bad.example.invalid")
+            with pytest.raises(FetchError, match="Could not resolve"):
+                await _check_hostname("bad.example.invalid")
+            assert mock_gai.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_refetched(self):
+        fake_info = [(10, 1, 6, '', ('93.184.216.34', 80, 0, 0))]
+        with patch("fetch.socket.getaddrinfo", return_value=fake_info) as mock_gai:
+            await _check_hostname("stale.example.com")
+            # Manually expire the entry
+            ts, addrs = fetch._dns_cache._entries["stale.example.com"]
+            fetch._dns_cache._entries["stale.example.com"] = (ts - fetch.DNS_CACHE_TTL - 1, addrs)
+            await _check_hostname("stale.example.com")
+            assert mock_gai.call_count == 2
 
 
 class TestIPv6Mapped:
     """Test that IPv6-mapped IPv4 addresses are properly blocked."""
 
-    def test_rejects_ipv6_mapped_loopback(self):
+    @pytest.mark.asyncio
+    async def test_rejects_ipv6_mapped_loopback(self):
         # Mock getaddrinfo to return an IPv6-mapped IPv4 loopback
         fake_info = [(10, 1, 6, '', ('::ffff:127.0.0.1', 80, 0, 0))]
         with patch("fetch.socket.getaddrinfo", return_value=fake_info):
             with pytest.raises(FetchError, match="private/internal"):
-                _check_hostname("evil.example.com")
+                await _check_hostname("evil.example.com")
 
-    def test_rejects_ipv6_mapped_metadata(self):
+    @pytest.mark.asyncio
+    async def test_rejects_ipv6_mapped_metadata(self):
         # Mock getaddrinfo to return IPv6-mapped AWS metadata endpoint
         fake_info = [(10, 1, 6, '', ('::ffff:169.254.169.254', 80, 0, 0))]
         with patch("fetch.socket.getaddrinfo", return_value=fake_info):
             with pytest.raises(FetchError, match="private/internal"):
-                _check_hostname("evil.example.com")
+                await _check_hostname("evil.example.com")
 
-    def test_rejects_ipv6_mapped_10_x(self):
+    @pytest.mark.asyncio
+    async def test_rejects_ipv6_mapped_10_x(self):
         fake_info = [(10, 1, 6, '', ('::ffff:10.0.0.1', 80, 0, 0))]
         with patch("fetch.socket.getaddrinfo", return_value=fake_info):
             with pytest.raises(FetchError, match="private/internal"):
-                _check_hostname("evil.example.com")
+                await _check_hostname("evil.example.com")
 
-    def test_allows_ipv6_mapped_public(self):
+    @pytest.mark.asyncio
+    async def test_allows_ipv6_mapped_public(self):
         # IPv6-mapped public IP should be allowed
         fake_info = [(10, 1, 6, '', ('::ffff:93.184.216.34', 80, 0, 0))]
         with patch("fetch.socket.getaddrinfo", return_value=fake_info):
-            _check_hostname("example.com")  # Should not raise
+            await _check_hostname("example.com")  # Should not raise
 
 
 class TestRedirectValidation:
@@ -103,22 +181,18 @@ class TestRedirectValidation:
     @pytest.mark.asyncio
     async def test_fetch_page_validates_redirect_target(self):
         """Ensure fetch_page calls validate_url on the final URL after redirects."""
-        import asyncio
         from unittest.mock import AsyncMock
-        import fetch
 
         mock_page = AsyncMock()
         mock_page.url = "http://127.0.0.1/secret"
         mock_page.context = AsyncMock()
         mock_response = AsyncMock()
         mock_response.status = 200
-
-        real_semaphore = asyncio.Semaphore(4)
+        mock_response.headers = {"content-type": "text/html"}
 
         with patch.object(fetch, "validate_url", wraps=fetch.validate_url) as mock_validate, \
              patch.object(fetch, "new_page", new_callable=AsyncMock, return_value=mock_page), \
-             patch.object(fetch, "_navigate", new_callable=AsyncMock, return_value=mock_response), \
-             patch.object(fetch, "_get_semaphore", return_value=real_semaphore):
+             patch.object(fetch, "_navigate", new_callable=AsyncMock, return_value=mock_response):
             with pytest.raises(FetchError, match="private/internal"):
                 await fetch.fetch_page("https://example.com")
             # Should have been called at least twice: once for original URL, once for redirect